@@ -5,10 +5,12 @@ Developer: Rikesh Chhetri
 Description: Configuration management using Pydantic Settings.
 ------------------------------------------------------------------------------
 """
-from typing import Optional, List
+from functools import cached_property
+from typing import Optional, FrozenSet
 import logging
 import sys
 import structlog
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -37,12 +39,14 @@ class Settings(BaseSettings):
     SNOWFLAKE_PRIVATE_KEY_PATH: Optional[str] = "rsa_key.p8"
     SNOWFLAKE_PRIVATE_KEY_CONTENT: Optional[str] = None # Support for passing key as env var (Codespaces Secrets/Render)
     SNOWFLAKE_PRIVATE_KEY_PASSPHRASE: Optional[str] = None
+    SNOWFLAKE_MAX_CONCURRENCY: int = Field(8, ge=1) # Max partitions fetched in parallel per query
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
-    @property
-    def valid_api_keys(self) -> List[str]:
-        return [key.strip() for key in self.API_KEY.split(",") if key.strip()]
+    @cached_property
+    def valid_api_keys(self) -> FrozenSet[str]:
+        # Parsed once on first access; API_KEY does not change at runtime.
+        return frozenset(key.strip() for key in self.API_KEY.split(",") if key.strip())
 
 settings = Settings()
 
@@ -64,8 +68,13 @@ def configure_logging():
             structlog.dev.ConsoleRenderer(),
         ]
 
+    # Filter by LOG_LEVEL in the bound logger itself so calls below the level
+    # are no-ops that skip the processor chain entirely
+    log_level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
+
     structlog.configure(
         processors=processors,
+        wrapper_class=structlog.make_filtering_bound_logger(log_level),
         logger_factory=structlog.PrintLoggerFactory(),
         cache_logger_on_first_use=True,
     )
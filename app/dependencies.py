@@ -13,19 +13,8 @@ from app.key_manager import key_manager
 
 async def verify_api_key(x_api_key: Annotated[str, Header(description="API Key for external clients")]):
     """Verifies the X-API-KEY header securely against the dynamic key manager."""
-    is_valid = False
-    
-    # Use KeyManager for validation
-    if key_manager.is_valid(x_api_key):
-        is_valid = True
-    # Fallback to compare_digest against env vars if manager fails (redundant but safe)
-    else:
-        for valid_key in settings.valid_api_keys:
-            if secrets.compare_digest(x_api_key, valid_key):
-                is_valid = True
-                break
-            
-    if not is_valid:
+    # KeyManager is authoritative (env keys are loaded into it); one O(1) digest lookup
+    if not key_manager.is_valid(x_api_key):
         raise HTTPException(
             status_code=401, 
             detail={
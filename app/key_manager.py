@@ -1,23 +1,49 @@
-import json
+import asyncio
+import hashlib
 import os
+import threading
+from pathlib import Path
+import orjson
 from typing import List, Set
 from app.config import settings, logger
 
 KEY_FILE = "api_keys.json"
 
+# Per-process pepper for the in-memory key digests. Digests never leave the
+# process (the key file stores raw keys), so a random pepper is sufficient.
+_PEPPER = os.urandom(32)
+
+def _h(key: str) -> bytes:
+    """Returns the peppered blake2b digest used for key lookups."""
+    return hashlib.blake2b(key.encode(), digest_size=32, key=_PEPPER).digest()
+
 class KeyManager:
     def __init__(self):
         self._keys: Set[str] = set()
-        self._load_keys()
+        self._hashed: Set[bytes] = set()
+        # Guards key-set changes and the file write that follows them;
+        # add_key/revoke_key may run in worker threads. Re-entrant because
+        # _save_keys takes it too.
+        self._lock = threading.RLock()
+        # Keys are loaded by start() during app startup (or lazily on first use)
+        self._loaded = False
+
+    async def start(self):
+        """Loads keys off the event loop; called from the app lifespan."""
+        if not self._loaded:
+            await asyncio.to_thread(self._load_keys)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._load_keys()
 
     def _load_keys(self):
         """Loads keys from the JSON file. If not exists, falls back to env vars."""
         if os.path.exists(KEY_FILE):
             try:
-                with open(KEY_FILE, "r") as f:
-                    data = json.load(f)
-                    self._keys = set(data.get("keys", []))
-                    logger.info(f"Loaded {len(self._keys)} API keys from {KEY_FILE}")
+                data = orjson.loads(Path(KEY_FILE).read_bytes())
+                self._keys = set(data.get("keys", []))
+                logger.info(f"Loaded {len(self._keys)} API keys from {KEY_FILE}")
             except Exception as e:
                 logger.error(f"Failed to load api_keys.json: {e}")
         
@@ -29,32 +55,46 @@ class KeyManager:
             if len(self._keys) > count_before:
                 self._save_keys() # Sync env keys to file
 
+        self._hashed = {_h(key) for key in self._keys}
+        self._loaded = True
+
     def _save_keys(self):
         """Saves current keys to the JSON file."""
         try:
-            with open(KEY_FILE, "w") as f:
-                json.dump({"keys": list(self._keys)}, f, indent=2)
+            # Snapshot and write under one lock so an older snapshot can
+            # never overwrite a newer one
+            with self._lock:
+                payload = orjson.dumps({"keys": list(self._keys)}, option=orjson.OPT_INDENT_2)
+                Path(KEY_FILE).write_bytes(payload)
         except Exception as e:
             logger.error(f"Failed to save api_keys.json: {e}")
 
     def add_key(self, key: str):
         """Adds a new key and saves it."""
-        self._keys.add(key)
-        self._save_keys()
+        self._ensure_loaded()
+        with self._lock:
+            self._keys.add(key)
+            self._hashed.add(_h(key))
+            self._save_keys()
         logger.info("Added new API key")
 
     def revoke_key(self, key: str):
         """Removes a key and saves."""
-        if key in self._keys:
+        self._ensure_loaded()
+        with self._lock:
+            if key not in self._keys:
+                return
             self._keys.remove(key)
+            self._hashed.discard(_h(key))
             self._save_keys()
-            logger.info("Revoked API key")
+        logger.info("Revoked API key")
 
     def is_valid(self, key: str) -> bool:
         """Checks if a key exists."""
-        # Reload checks could be added here for multi-worker sync, 
-        # but for now in-memory set is fast and simple.
-        return key in self._keys
+        self._ensure_loaded()
+        # Lookups go through the digest set so the comparison never touches
+        # the stored key material directly; one hash + one set probe per call.
+        return _h(key) in self._hashed
 
 # Global instance
 key_manager = KeyManager()
@@ -9,9 +9,12 @@ from fastapi import FastAPI, Depends, HTTPException, Query, Path, Request, Respo
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse, StreamingResponse
 from contextlib import asynccontextmanager
-from typing import List, Any, Dict, Optional, Union
+from functools import lru_cache
+import asyncio
+from typing import List, Any, Dict, Optional, Tuple, Union
 import httpx
-import json
+import orjson
+import re
 
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -21,19 +24,39 @@ from slowapi.middleware import SlowAPIMiddleware
 from app.config import settings, logger
 from app.dependencies import verify_api_key, verify_admin_secret
 from app.snowflake_client import snowflake_client
-from app.models import StandardResponse, MetaData
+from app.models import StandardResponse
 from app.utils import generate_secure_key, TTLCache
 from app.key_manager import key_manager
-from app.registry import VIEW_ALLOWLIST
+from app.registry import VIEW_LOOKUP
 from app.middleware import AuditMiddleware
 from app.scheduler import start_scheduler, stop_scheduler
 
-# Initialize Cache (stores up to 100 queries for 5 minutes)
-response_cache = TTLCache(ttl_seconds=300)
+# Initialize Cache (stores up to 100 queries for 5 minutes; LRU eviction beyond that)
+response_cache = TTLCache(capacity=100, ttl_seconds=300)
+
+# Pagination bounds, resolved once for the route signature
+_DEFAULT_PAGE_LIMIT = settings.DEFAULT_PAGE_LIMIT
+_MAX_PAGE_LIMIT = settings.MAX_PAGE_LIMIT
+
+# Query parameters consumed by the data endpoint itself (never treated as filters)
+_RESERVED_PARAMS = frozenset(("limit", "offset", "stream", "test_filter_col", "test_filter_val"))
+
+# Strict column name validation for filters (SQL identifier: letter/underscore first, then alphanumeric + underscore)
+_COL_RE = re.compile(r"\A[A-Za-z_][A-Za-z0-9_]{0,63}\Z")
+
+class OrjsonResponse(JSONResponse):
+    """JSONResponse rendered with orjson's C encoder."""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+# Target size of each NDJSON chunk sent when streaming
+_STREAM_CHUNK_SIZE = 16384
 
 # Rate Limit Key Function: Limit by API Key if present, otherwise fallback to IP
 def get_rate_limit_key(request: Request) -> str:
-    return request.headers.get("X-API-KEY", get_remote_address(request))
+    # Only resolve the client address when no key is sent (Starlette stores header names lowercased)
+    key = request.headers.get("x-api-key")
+    return key if key is not None else get_remote_address(request)
 
 # Initialize Rate Limiter with API Key tracking
 limiter = Limiter(key_func=get_rate_limit_key)
@@ -42,6 +65,7 @@ limiter = Limiter(key_func=get_rate_limit_key)
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up Data Product API...")
+    await key_manager.start()
     start_scheduler()
     yield
     # Shutdown
@@ -53,7 +77,8 @@ app = FastAPI(
     title="Snowflake Data Product API",
     version="2.1.0",
     description="Developed by Rikesh Chhetri",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=OrjsonResponse
 )
 
 # Register Middleware
@@ -62,16 +87,23 @@ app.add_middleware(SlowAPIMiddleware)
 
 # Register Rate Limit Handler
 app.state.limiter = limiter
+
+@lru_cache(maxsize=32)
+def _rate_limit_body(detail: str) -> bytes:
+    """Pre-renders the 429 payload; there is one per distinct limit string."""
+    return orjson.dumps({
+        "status": "error", 
+        "code": "RATE_LIMIT_EXCEEDED",
+        "message": f"Rate limit exceeded: {detail}",
+        "details": "Please wait before sending more requests."
+    })
+
 @app.exception_handler(RateLimitExceeded)
 async def custom_rate_limit_handler(request: Request, exc: RateLimitExceeded):
-    return JSONResponse(
+    return Response(
+        content=_rate_limit_body(exc.detail),
         status_code=429,
-        content={
-            "status": "error", 
-            "code": "RATE_LIMIT_EXCEEDED",
-            "message": f"Rate limit exceeded: {exc.detail}",
-            "details": "Please wait before sending more requests."
-        }
+        media_type="application/json"
     )
 
 @app.exception_handler(RequestValidationError)
@@ -83,7 +115,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         msg = error["msg"]
         errors.append(f"{field}: {msg}")
     
-    return JSONResponse(
+    return OrjsonResponse(
         status_code=422,
         content={
             "status": "error", 
@@ -108,7 +140,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         if "message" not in content:
             content["message"] = "An error occurred."
             
-    return JSONResponse(
+    return OrjsonResponse(
         status_code=exc.status_code,
         content=content
     )
@@ -116,11 +148,17 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 @app.exception_handler(httpx.RequestError)
 async def upstream_connection_error_handler(request: Request, exc: httpx.RequestError):
     logger.error(f"Upstream Connection Error: {exc}")
-    return JSONResponse(
+    return OrjsonResponse(
         status_code=503,
         content={"status": "error", "message": "Service Unavailable: Unable to connect to Snowflake"}
     )
 
+# Snowflake error code -> (HTTP status, client-facing message)
+_SNOWFLAKE_ERR_MAP = {
+    "002003": (404, "The requested data view could not be found in Snowflake."), # Object does not exist
+    "001003": (400, "Invalid Query generated."), # SQL Compilation Error
+}
+
 @app.exception_handler(httpx.HTTPStatusError)
 async def http_status_error_handler(request: Request, exc: httpx.HTTPStatusError):
     logger.error(f"Upstream API Error: {exc.response.text}")
@@ -136,19 +174,14 @@ async def http_status_error_handler(request: Request, exc: httpx.HTTPStatusError
         error_code = error_data.get("code", str(status_code))
         
         # Smart Mapping of Snowflake Errors
-        if error_code == "002003": # Object does not exist
-            status_code = 404
-            message = "The requested data view could not be found in Snowflake."
-            details = {"snowflake_message": error_data.get("message")}
-        elif error_code == "001003": # SQL Compilation Error
-            status_code = 400
-            message = "Invalid Query generated."
+        if error_code in _SNOWFLAKE_ERR_MAP:
+            status_code, message = _SNOWFLAKE_ERR_MAP[error_code]
             details = {"snowflake_message": error_data.get("message")}
             
     except Exception:
         message = exc.response.text
         
-    return JSONResponse(
+    return OrjsonResponse(
         status_code=status_code,
         content={
             "status": "error",
@@ -161,13 +194,13 @@ async def http_status_error_handler(request: Request, exc: httpx.HTTPStatusError
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global exception: {exc}", exc_info=True)
-    return JSONResponse(
+    return OrjsonResponse(
         status_code=500,
         content={"status": "error", "message": "Internal Server Error"}
     )
 
 @app.get("/health", tags=["System"])
-@limiter.limit("5/minute")
+@limiter.limit(settings.RATE_LIMIT_HEALTH)
 async def health_check(request: Request):
     """Checks service health and Snowflake connectivity."""
     snowflake_status = await snowflake_client.check_connection()
@@ -186,7 +219,8 @@ async def generate_new_api_key(request: Request):
     Requires 'X-ADMIN-SECRET' header.
     """
     new_key = generate_secure_key()
-    key_manager.add_key(new_key)
+    # Persisting the key file is blocking I/O; keep it off the event loop
+    await asyncio.to_thread(key_manager.add_key, new_key)
     
     return {
         "status": "success",
@@ -194,70 +228,99 @@ async def generate_new_api_key(request: Request):
         "message": "Key generated and activated successfully. It is ready to use immediately."
     }
 
-async def fetch_table_data(table_name: str, limit: int, offset: int, filters: Optional[Dict[str, Any]] = None, response: Optional[Response] = None):
+def apply_filters(query: str, filter_pairs: List[Tuple[str, Any]], bindings: Dict[str, Any]) -> str:
+    """
+    Appends a WHERE clause for the given (column, value) filters and adds their bindings.
+    Columns must already be validated (see extract_filters).
+    """
+    where_clauses = [f"{col} = :filter_{i}" for i, (col, _) in enumerate(filter_pairs)]
+    bindings.update({f"filter_{i}": val for i, (_, val) in enumerate(filter_pairs)})
+    return f"{query} WHERE {' AND '.join(where_clauses)}"
+
+def extract_filters(request: Request, test_filter_col: Optional[str] = None, test_filter_val: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Collects validated (column, value) filters from the non-reserved query parameters
+    (plus the Swagger test params). Columns that fail strict name validation
+    (alphanumeric + underscore only) are dropped.
+    """
+    query_params = request.query_params
+    candidates = []
+    
+    # Handle explicit Swagger test params (a real query param of the same name wins)
+    if test_filter_col and test_filter_val and test_filter_col not in query_params:
+        candidates.append((test_filter_col, test_filter_val))
+    candidates.extend(query_params.items())
+
+    filter_pairs = []
+    for col, val in candidates:
+        if col in _RESERVED_PARAMS:
+            continue
+        if not _COL_RE.match(col):
+            logger.warning(f"Invalid column name in filter: {col}")
+            continue
+        filter_pairs.append((col, val))
+    return filter_pairs
+
+async def fetch_table_data(table_name: str, limit: int, offset: int, filter_pairs: Optional[List[Tuple[str, Any]]] = None) -> Response:
     """
     Helper to fetch paginated data from a table/view with caching and filtering.
+    Returns a pre-serialized JSON response in the StandardResponse shape.
     """
     try:
-        # Check Cache (only if no filters are applied, for simplicity, or include filters in cache key)
-        # Including filters in cache key is better.
-        filter_str = str(sorted(filters.items())) if filters else ""
-        cache_key = f"{table_name}:{limit}:{offset}:{filter_str}"
+        # Check Cache (filters are part of the key; a plain tuple hashes without any string building)
+        cache_key = (table_name, limit, offset, tuple(sorted(filter_pairs)) if filter_pairs else ())
         
         cached_result = response_cache.get(cache_key)
-        if cached_result:
-            logger.info(f"Cache hit for {cache_key}")
-            # Add cache hit header if response object is available
-            if response:
-                response.headers["X-Cache"] = "HIT"
-            return cached_result
+        if cached_result is not None:
+            logger.debug("cache_hit", key=cache_key)
+            # Cached value is the already-encoded body: no serialization on hits
+            return Response(
+                content=cached_result,
+                media_type="application/json",
+                headers={"X-Cache": "HIT"}
+            )
 
         query = f"SELECT * FROM {table_name}"
         bindings = {"limit": limit, "offset": offset}
         
         # Add WHERE clauses for filters
-        if filters:
-            where_clauses = []
-            for i, (col, val) in enumerate(filters.items()):
-                # Strict column name validation (alphanumeric + underscore only)
-                if not col.replace("_", "").isalnum():
-                    logger.warning(f"Invalid column name in filter: {col}")
-                    continue
-                
-                param_name = f"filter_{i}"
-                where_clauses.append(f"{col} = :{param_name}")
-                bindings[param_name] = val
-            
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
+        if filter_pairs:
+            query = apply_filters(query, filter_pairs, bindings)
         
         query += " LIMIT :limit OFFSET :offset"
         
         results = await snowflake_client.execute_query(query, bindings)
         
-        # Set headers
-        if response:
-            response.headers["X-Result-Count"] = str(len(results))
-            response.headers["X-Cache"] = "MISS"
-
-        response_obj = StandardResponse(
-            data=results,
-            meta=MetaData(
-                total=len(results), 
-                limit=limit,
-                offset=offset
-            )
-        )
+        # Same shape as StandardResponse[List[Any]], built as a plain dict so it
+        # can go straight to orjson without model construction and validation
+        payload = {
+            "status": "success",
+            "data": results,
+            "meta": {
+                "total": len(results),
+                "limit": limit,
+                "offset": offset
+            }
+        }
+        
+        body = orjson.dumps(payload)
         
         # Set Cache
-        response_cache.set(cache_key, response_obj)
+        response_cache.set(cache_key, body)
         
-        return response_obj
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={
+                "X-Result-Count": str(len(results)),
+                "X-Cache": "MISS"
+            }
+        )
     except Exception as e:
         logger.error(f"Error fetching {table_name}: {e}")
         raise e
 
-async def stream_table_data(table_name: str, filters: Optional[Dict[str, Any]] = None):
+async def stream_table_data(table_name: str, filter_pairs: Optional[List[Tuple[str, Any]]] = None):
     """
     Helper to stream data from a table/view using NDJSON format.
     Bypasses cache and pagination limits for large data exports.
@@ -266,23 +329,14 @@ async def stream_table_data(table_name: str, filters: Optional[Dict[str, Any]] =
         query = f"SELECT * FROM {table_name}"
         bindings = {}
         
-        if filters:
-            where_clauses = []
-            for i, (col, val) in enumerate(filters.items()):
-                if not col.replace("_", "").isalnum():
-                    continue
-                param_name = f"filter_{i}"
-                where_clauses.append(f"{col} = :{param_name}")
-                bindings[param_name] = val
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
+        if filter_pairs:
+            query = apply_filters(query, filter_pairs, bindings)
         
-        # Generator function
-        async def generate():
-            async for row in snowflake_client.execute_query_stream(query, bindings):
-                yield json.dumps(row) + "\n"
-                
-        return StreamingResponse(generate(), media_type="application/x-ndjson")
+        # Rows go from Snowflake to the wire as NDJSON chunks, never buffered as a whole
+        return StreamingResponse(
+            snowflake_client.execute_query_ndjson(query, bindings, chunk_size=_STREAM_CHUNK_SIZE),
+            media_type="application/x-ndjson"
+        )
         
     except Exception as e:
         logger.error(f"Error streaming {table_name}: {e}")
@@ -294,12 +348,11 @@ async def stream_table_data(table_name: str, filters: Optional[Dict[str, Any]] =
     dependencies=[Depends(verify_api_key)],
     tags=["Dynamic Data"]
 )
-@limiter.limit("50/minute")
+@limiter.limit(settings.RATE_LIMIT_PRODUCTS)
 async def get_data_view(
     request: Request,
-    response: Response,
     view_id: str = Path(..., description="The ID of the view to fetch (e.g., 'companies', 'fbi-crime')"),
-    limit: int = Query(settings.DEFAULT_PAGE_LIMIT, ge=1, le=settings.MAX_PAGE_LIMIT, description="Max records to return (ignored if stream=true)"),
+    limit: int = Query(_DEFAULT_PAGE_LIMIT, ge=1, le=_MAX_PAGE_LIMIT, description="Max records to return (ignored if stream=true)"),
     offset: int = Query(0, ge=0, description="Records to skip (ignored if stream=true)"),
     stream: bool = Query(False, description="If true, returns NDJSON stream for large datasets"),
     # Helper params for Swagger UI testing
@@ -319,36 +372,16 @@ async def get_data_view(
     Since Swagger UI cannot generate dynamic fields, use `test_filter_col` and `test_filter_val` below to simulate a filter like `?industry=Tech`.
     """
     # 1. Resolve view_id to Table Name
-    table_name = None
-    if view_id in VIEW_ALLOWLIST:
-        table_name = VIEW_ALLOWLIST[view_id]
-    elif view_id in VIEW_ALLOWLIST.values():
-        table_name = view_id
-    
-    if not table_name:
-        # Fallback case-insensitive
-        upper_view_id = view_id.upper().replace("-", "_")
-        if upper_view_id in VIEW_ALLOWLIST:
-            table_name = VIEW_ALLOWLIST[upper_view_id]
-        elif upper_view_id in VIEW_ALLOWLIST.values():
-            table_name = upper_view_id
-            
+    table_name = VIEW_LOOKUP.get(view_id) or VIEW_LOOKUP.get(view_id.upper().replace("-", "_"))
+
     if not table_name:
          raise HTTPException(status_code=404, detail=f"View '{view_id}' not found or not allowed.")
 
     # 2. Extract Filters
-    filters = {}
-    
-    # Handle explicit Swagger test params
-    if test_filter_col and test_filter_val:
-        filters[test_filter_col] = test_filter_val
-
-    for key, value in request.query_params.items():
-        if key not in ["limit", "offset", "stream", "test_filter_col", "test_filter_val"]:
-            filters[key] = value
+    filter_pairs = extract_filters(request, test_filter_col, test_filter_val)
             
     # 3. Stream or Fetch
     if stream:
-        return await stream_table_data(table_name, filters)
+        return await stream_table_data(table_name, filter_pairs)
     else:
-        return await fetch_table_data(table_name, limit, offset, filters, response)
+        return await fetch_table_data(table_name, limit, offset, filter_pairs)
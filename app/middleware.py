@@ -1,22 +1,35 @@
+import asyncio
 import time
-import json
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.config import logger
 
 class AuditMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        # Strong references to in-flight audit tasks (the loop only keeps weak ones)
+        self._pending = set()
+
     async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Extract client info
-        client_ip = request.client.host if request.client else "unknown"
-        user_agent = request.headers.get("user-agent", "unknown")
+        start_time = time.perf_counter()
         
         # Process request
         response = await call_next(request)
         
         # Calculate duration
-        process_time = (time.time() - start_time) * 1000
+        process_time = (time.perf_counter() - start_time) * 1000.0
+        
+        # Build and emit the log entry after the response is handed back
+        task = asyncio.create_task(self._emit_audit(request, response.status_code, process_time))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        
+        return response
+
+    async def _emit_audit(self, request: Request, status_code: int, process_time: float):
+        # Extract client info
+        client_ip = request.client.host if request.client else "unknown"
+        user_agent = request.headers.get("user-agent", "unknown")
         
         # Extract API Key ID (masked) if present
         # We rely on the fact that verify_api_key might have run, 
@@ -25,22 +38,18 @@ class AuditMiddleware(BaseHTTPMiddleware):
         api_key = request.headers.get("X-API-KEY")
         key_id = f"sk_...{api_key[-4:]}" if api_key and len(api_key) > 4 else "anonymous"
 
-        # Structured Log
+        # Structured Log (timestamp is added by structlog's TimeStamper)
         log_entry = {
-            "timestamp": time.time(),
-            "event": "api_request",
             "client_ip": client_ip,
             "user_agent": user_agent,
             "method": request.method,
             "path": request.url.path,
             "query": str(request.query_params),
-            "status_code": response.status_code,
+            "status_code": status_code,
             "duration_ms": round(process_time, 2),
             "key_id": key_id
         }
         
-        # Log at INFO level
+        # Log at INFO level; the configured renderer serializes the entry once
         # In a real setup, we might write this to a separate audit.log file
-        logger.info(json.dumps(log_entry))
-        
-        return response
+        logger.info("api_request", **log_entry)
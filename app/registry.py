@@ -36,25 +36,18 @@ def load_view_registry() -> Dict[str, str]:
     try:
         if view_list_path.exists():
             logger.info(f"Loading views from {view_list_path}")
-            with open(view_list_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-                
-            count = 0
-            for line in lines:
-                table_name = line.strip()
-                
-                # Skip empty lines or header
-                if not table_name or table_name.lower() == "name":
-                    continue
-                    
-                # Generate slug: AIRCRAFT_CARRIER_INDEX -> aircraft-carrier-index
-                slug = table_name.lower().replace("_", "-")
-                
-                # Add to registry (won't overwrite manual aliases if we did dict.update, 
-                # but here we just set keys. If we want manual to win, we should be careful.
-                # Actually, having both 'company-index' and 'companies' pointing to the same table is fine.)
-                registry[slug] = table_name
-                count += 1
+            text = view_list_path.read_text(encoding="utf-8")
+            
+            # Generate slugs: AIRCRAFT_CARRIER_INDEX -> aircraft-carrier-index
+            # (skipping empty lines and the header). These sit alongside the manual aliases;
+            # having both 'company-index' and 'companies' point to the same table is fine.
+            views = {
+                table_name.lower().replace("_", "-"): table_name
+                for line in text.splitlines()
+                if (table_name := line.strip()) and table_name.lower() != "name"
+            }
+            registry.update(views)
+            count = len(views)
                 
             logger.info(f"Successfully loaded {count} views from file. Total registry size: {len(registry)}")
         else:
@@ -66,5 +59,20 @@ def load_view_registry() -> Dict[str, str]:
         
     return registry
 
+def build_view_lookup(registry: Dict[str, str]) -> Dict[str, str]:
+    """
+    Maps every accepted spelling of a view to its canonical table name:
+    the slug ('company-index'), the table name ('COMPANY_INDEX') and their
+    upper/underscored and lower/dashed variants.
+    """
+    lookup = {}
+    for slug, table_name in registry.items():
+        lookup[slug] = table_name
+        lookup[slug.upper().replace("-", "_")] = table_name
+        lookup[table_name] = table_name
+        lookup[table_name.lower().replace("_", "-")] = table_name
+    return lookup
+
 # Initialize the registry
 VIEW_ALLOWLIST = load_view_registry()
+VIEW_LOOKUP = build_view_lookup(VIEW_ALLOWLIST)
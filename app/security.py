@@ -12,16 +12,19 @@ import jwt
 import os
 import hashlib
 import base64
+import time
 from typing import Optional, Tuple
 from app.config import settings, logger
 
 # Global cache
 _PRIVATE_KEY_CACHE = None
-_JWT_CACHE: Optional[Tuple[str, datetime]] = None
+# (token, monotonic deadline after which it must be regenerated)
+_JWT_CACHE: Optional[Tuple[str, float]] = None
+_PUBKEY_FINGERPRINT: Optional[str] = None
 
 def load_private_key():
     """Loads the private key from the specified path with caching."""
-    global _PRIVATE_KEY_CACHE
+    global _PRIVATE_KEY_CACHE, _PUBKEY_FINGERPRINT
     
     if _PRIVATE_KEY_CACHE:
         return _PRIVATE_KEY_CACHE
@@ -40,24 +43,42 @@ def load_private_key():
             password=settings.SNOWFLAKE_PRIVATE_KEY_PASSPHRASE.encode() if settings.SNOWFLAKE_PRIVATE_KEY_PASSPHRASE else None,
             backend=default_backend()
         )
+        # Fill both caches together so the fingerprint always matches the cached key
+        _PUBKEY_FINGERPRINT = _compute_fingerprint(private_key)
         _PRIVATE_KEY_CACHE = private_key
         return private_key
     except Exception as e:
         logger.error(f"Failed to load private key: {e}")
         raise
 
+def _compute_fingerprint(private_key) -> str:
+    """SHA-256 fingerprint of the public key, base64 encoded as Snowflake expects."""
+    public_key_der = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    sha256_hash = hashlib.sha256(public_key_der).digest()
+    return base64.b64encode(sha256_hash).decode('utf-8')
+
+def get_public_key_fingerprint(private_key) -> str:
+    """Returns the public key fingerprint; cached for the key held by load_private_key()."""
+    if private_key is _PRIVATE_KEY_CACHE and _PUBKEY_FINGERPRINT:
+        return _PUBKEY_FINGERPRINT
+    return _compute_fingerprint(private_key)
+
 def get_snowflake_jwt() -> str:
     """Generates or retrieves a valid JWT for Snowflake authentication."""
     global _JWT_CACHE
     
-    now = datetime.now(timezone.utc)
-    
-    # Check if we have a valid cached token (with 5 minutes buffer)
+    # Check if we have a valid cached token (deadline already includes a 5 minute buffer).
+    # A monotonic clock keeps the hit path to one float compare and is immune to wall-clock jumps.
     if _JWT_CACHE:
-        token, expires_at = _JWT_CACHE
-        if now < (expires_at - timedelta(minutes=5)):
+        token, refresh_at = _JWT_CACHE
+        if time.monotonic() < refresh_at:
             return token
             
+    now = datetime.now(timezone.utc)
+            
     try:
         private_key = load_private_key()
         
@@ -68,14 +89,8 @@ def get_snowflake_jwt() -> str:
         lifetime = timedelta(minutes=59) # Max 60 minutes
         expires_at = now + lifetime
         
-        # Calculate Public Key Fingerprint
-        public_key = private_key.public_key()
-        public_key_der = public_key.public_bytes(
-            encoding=serialization.Encoding.DER,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
-        sha256_hash = hashlib.sha256(public_key_der).digest()
-        fingerprint = base64.b64encode(sha256_hash).decode('utf-8')
+        # Public Key Fingerprint (cached alongside the private key)
+        fingerprint = get_public_key_fingerprint(private_key)
         
         payload = {
             "iss": f"{qualified_username}.SHA256:{fingerprint}",
@@ -91,7 +106,7 @@ def get_snowflake_jwt() -> str:
         )
         
         # Update cache
-        _JWT_CACHE = (encoded_jwt, expires_at)
+        _JWT_CACHE = (encoded_jwt, time.monotonic() + (lifetime - timedelta(minutes=5)).total_seconds())
         
         return encoded_jwt
     except Exception as e:
@@ -6,13 +6,24 @@ Description: Async Snowflake Client using the SQL API v2.
 ------------------------------------------------------------------------------
 """
 import asyncio
+from collections import deque
+from functools import lru_cache
+from itertools import islice
 import httpx
+import orjson
 import uuid
-from typing import List, Dict, Any, Optional
-import json
+from typing import List, Dict, Any, Deque, Optional, Tuple
 from app.config import settings, logger
 from app.security import get_snowflake_jwt
 
+@lru_cache(maxsize=512)
+def _lower_columns(names: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Lowercased column names; the same SELECT shape recurs across requests."""
+    return tuple(name.lower() for name in names)
+
+# Python type -> Snowflake SQL API binding type (anything else is sent as TEXT)
+_BINDING_TYPES = {int: "FIXED", float: "REAL", bool: "BOOLEAN", str: "TEXT"}
+
 class SnowflakeClient:
     _client: Optional[httpx.AsyncClient] = None
 
@@ -21,25 +32,47 @@ class SnowflakeClient:
         self.headers = {
             "Accept": "application/json",
             "User-Agent": "SnowflakePythonAPI/1.0",
+            "X-Snowflake-Authorization-Token-Type": "KEYPAIR_JWT",
         }
+        # Full request headers for the current JWT; rebuilt only when the token changes
+        self._cached_token: Optional[str] = None
+        self._cached_headers: Dict[str, str] = {}
 
     async def get_client(self) -> httpx.AsyncClient:
+        # No await between the check and the assignment, so concurrent coroutines on
+        # the event loop can't both observe a missing client and create two.
         if self._client is None or self._client.is_closed:
-            self._client = httpx.AsyncClient(timeout=30.0)
+            # HTTP/2 multiplexes partition GETs over one TLS connection per host.
+            # The pool is shared by every in-flight API request in the process, so it
+            # is sized independently of the per-query partition fan-out (it still has to
+            # cover many concurrent queries on an HTTP/1.1 fallback); idle connections
+            # are kept warm between requests.
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=64,
+                    max_keepalive_connections=32,
+                    keepalive_expiry=60.0
+                )
+            )
         return self._client
 
     async def close(self):
-        if self._client and not self._client.is_closed:
-            await self._client.aclose()
-            self._client = None
+        # Detach before awaiting: a get_client() call that runs while aclose() is
+        # suspended then creates a fresh client instead of having it cleared (and
+        # leaked) by the assignment after the await.
+        client, self._client = self._client, None
+        if client and not client.is_closed:
+            await client.aclose()
 
     def _get_headers(self) -> Dict[str, str]:
+        """Returns the auth headers. The dict is shared between requests; treat it as read-only."""
         token = get_snowflake_jwt()
-        return {
-            **self.headers,
-            "Authorization": f"Bearer {token}",
-            "X-Snowflake-Authorization-Token-Type": "KEYPAIR_JWT"
-        }
+        if token != self._cached_token:
+            self._cached_headers = {**self.headers, "Authorization": f"Bearer {token}"}
+            self._cached_token = token
+        return self._cached_headers
 
     async def _fetch_partition(self, client: httpx.AsyncClient, url: str) -> List[List[Any]]:
         """Fetches a single partition of data."""
@@ -52,7 +85,8 @@ class SnowflakeClient:
             headers = self._get_headers()
             response = await client.get(url, headers=headers)
             response.raise_for_status()
-            data = response.json()
+            # orjson parses the raw bytes directly (no str decode, much faster than stdlib json)
+            data = orjson.loads(response.content)
             return data.get("data", [])
         except Exception as e:
             logger.error(f"Failed to fetch partition {url}: {e}")
@@ -62,15 +96,10 @@ class SnowflakeClient:
         """
         Formats Python values into Snowflake SQL API bindings.
         """
-        formatted = {}
-        for key, value in bindings.items():
-            if isinstance(value, int):
-                formatted[key] = {"type": "FIXED", "value": str(value)}
-            elif isinstance(value, float):
-                formatted[key] = {"type": "REAL", "value": str(value)}
-            else:
-                formatted[key] = {"type": "TEXT", "value": str(value)}
-        return formatted
+        return {
+            key: {"type": _BINDING_TYPES.get(type(value), "TEXT"), "value": str(value)}
+            for key, value in bindings.items()
+        }
 
     async def execute_query(self, query: str, bindings: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
@@ -83,6 +112,22 @@ class SnowflakeClient:
             results.append(row)
         return results
 
+    async def execute_query_ndjson(self, query: str, bindings: Optional[Dict[str, Any]] = None, chunk_size: int = 16384):
+        """
+        Executes a SQL query and yields the rows as NDJSON bytes, suitable for piping
+        straight into a StreamingResponse. Rows are coalesced into ~chunk_size byte
+        chunks so the ASGI server isn't called once per row.
+        """
+        buf = bytearray()
+        async for row in self.execute_query_stream(query, bindings):
+            buf += orjson.dumps(row)
+            buf += b"\n"
+            if len(buf) >= chunk_size:
+                yield bytes(buf)
+                buf.clear()
+        if buf:
+            yield bytes(buf)
+
     async def execute_query_stream(self, query: str, bindings: Optional[Dict[str, Any]] = None):
         """
         Executes a SQL query and yields rows as they are fetched (Streaming).
@@ -108,9 +153,14 @@ class SnowflakeClient:
         headers = self._get_headers()
         
         try:
-            response = await client.post(url, json=payload, headers=headers)
+            # Pre-serialize with orjson rather than letting httpx run stdlib json.dumps
+            response = await client.post(
+                url,
+                content=orjson.dumps(payload),
+                headers={**headers, "Content-Type": "application/json"}
+            )
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
             statement_handle = data["statementHandle"]
             
@@ -127,14 +177,12 @@ class SnowflakeClient:
             # "data" might contain the first batch
             
             # Helper to process a batch of data
-            column_names = [col["name"].lower() for col in data["resultSetMetaData"]["rowType"]]
+            column_names = _lower_columns(tuple(col["name"] for col in data["resultSetMetaData"]["rowType"]))
             
+            # Lazily maps raw row arrays to dicts as the caller consumes them, so no
+            # intermediate per-partition list of dicts is materialized
             def process_rows(rows):
-                processed = []
-                for row in rows:
-                    item = dict(zip(column_names, row))
-                    processed.append(item)
-                return processed
+                return (dict(zip(column_names, row)) for row in rows)
 
             # Yield initial results if any
             if "data" in data:
@@ -156,10 +204,15 @@ class SnowflakeClient:
                  logger.warning(f"Row mismatch: Expected {total_rows}, got {first_chunk_rows} in first chunk, but no partitions listed.")
 
             if partitions:
-                tasks = []
+                urls = []
+
                 # Check if we already have the first partition in 'data'
                 has_initial_data = len(data.get("data", [])) > 0
-                
+
+                # Loop-invariant URL prefixes for relative partition URLs
+                base = self.base_url
+                stmt_prefix = f"{base}/api/v2/statements/{statement_handle}"
+
                 for index, partition in enumerate(partitions):
                     # If we already have the first partition (index 0) inline, skip fetching it again
                     if index == 0 and has_initial_data:
@@ -180,40 +233,58 @@ class SnowflakeClient:
                         logger.warning(f"Partition {index} missing URL, attempting to construct...")
                         p_url = f"/api/v2/statements/{statement_handle}?partition={index}"
 
-                    if not p_url.startswith("http"):
-                         # It's likely relative to the statement execution result or base
-                         # Let's try appending to base_url if it starts with /
-                         if p_url.startswith("/"):
-                             p_url = f"{self.base_url}{p_url}"
-                         else:
-                             # If it doesn't start with /, assume it's relative to the statements endpoint
-                             p_url = f"{self.base_url}/api/v2/statements/{statement_handle}/{p_url}" 
-                             
-                    tasks.append(self._fetch_partition(client, p_url))
-                
-                # Fetch all partitions in parallel
-                logger.info(f"Gathering {len(tasks)} partition tasks...")
-                if tasks:
-                    results_list = await asyncio.gather(*tasks)
-                else:
-                    results_list = []
-                logger.info("Partitions gathered.")
+                    if p_url.startswith("http"):
+                        pass
+                    elif p_url[0] == "/":
+                        # Relative to the account base URL
+                        p_url = base + p_url
+                    else:
+                        # Relative to the statements endpoint
+                        p_url = f"{stmt_prefix}/{p_url}"
+
+                    urls.append(p_url)
                 
-                for partition_rows in results_list:
-                    for item in process_rows(partition_rows):
-                        yield item
+                # Fetch partitions through a sliding window: at most SNOWFLAKE_MAX_CONCURRENCY
+                # fetches run ahead of the consumer, and the next one starts only when a
+                # partition is handed over. This bounds both the connection fan-out and the
+                # number of partition bodies buffered for a slow consumer, while rows keep
+                # their partition order.
+                logger.info(f"Fetching {len(urls)} partitions...")
+                pending_urls = iter(urls)
+                # Settings validation rejects values below 1; clamp anyway, since an empty
+                # window would silently drop every partition after the inline one
+                window_size = max(1, settings.SNOWFLAKE_MAX_CONCURRENCY)
+                window: Deque[asyncio.Task] = deque(
+                    asyncio.create_task(self._fetch_partition(client, url))
+                    for url in islice(pending_urls, window_size)
+                )
+                try:
+                    while window:
+                        partition_rows = await window.popleft()
+                        next_url = next(pending_urls, None)
+                        if next_url is not None:
+                            window.append(asyncio.create_task(self._fetch_partition(client, next_url)))
+                        for item in process_rows(partition_rows):
+                            yield item
+                finally:
+                    # Consumer stopped early or a partition failed: don't leave fetches running
+                    for task in window:
+                        task.cancel()
+                logger.info("Partitions fetched.")
 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 422:
+                # Parse the body once straight from bytes. The HTTPStatusError itself is
+                # re-raised so the app's handler can map Snowflake codes (e.g. 002003 -> 404).
+                raw = e.response.content
                 try:
-                    error_data = e.response.json()
-                    message = error_data.get("message", e.response.text)
+                    error_data = orjson.loads(raw)
                     code = error_data.get("code", "UNKNOWN")
+                    message = error_data.get("message") or raw.decode("utf-8", "replace")
                     logger.error(f"Snowflake 422 Error: [{code}] {message}")
-                    raise Exception(f"Snowflake Error [{code}]: {message}")
-                except Exception:
-                    logger.error(f"HTTP 422 Error: {e.response.text}")
-                    raise e
+                except (orjson.JSONDecodeError, AttributeError):
+                    logger.error(f"HTTP 422 Error: {raw.decode('utf-8', 'replace')}")
+                raise
             logger.error(f"HTTP Error: {e.response.text}")
             raise
 
@@ -1,35 +1,67 @@
+import heapq
+import itertools
 import secrets
-import string
-import time
+from time import monotonic as _now
 from collections import OrderedDict
-from typing import Any, Optional, Tuple
+from typing import Any, Hashable, List, Optional, Tuple
 
 def generate_secure_key(length=32, prefix="sk_"):
-    """Generates a secure, high-entropy API key."""
-    alphabet = string.ascii_letters + string.digits
-    api_key = ''.join(secrets.choice(alphabet) for _ in range(length))
+    """Generates a secure, high-entropy API key (URL-safe base64, 6 bits per character)."""
+    # One os.urandom read for the whole key instead of a CSPRNG call per character
+    api_key = secrets.token_urlsafe(length)[:length]
     return f"{prefix}{api_key}"
 
 class TTLCache:
     """Simple LRU Cache with Time To Live (TTL)."""
     def __init__(self, capacity: int = 100, ttl_seconds: int = 300):
-        self.cache: OrderedDict[str, Tuple[Any, float]] = OrderedDict()
+        self.cache: OrderedDict[Hashable, Tuple[Any, float]] = OrderedDict()
         self.capacity = capacity
         self.ttl = ttl_seconds
+        # (expiry time, seq, key) min-heap so expired entries can be purged without scanning;
+        # seq breaks ties so keys themselves never need to be comparable
+        self._expiry_heap: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
 
-    def get(self, key: str) -> Optional[Any]:
-        if key not in self.cache:
+    def get(self, key: Hashable) -> Optional[Any]:
+        # Single probe; a miss costs one hash lookup, a hit one lookup plus move_to_end
+        entry = self.cache.get(key)
+        if entry is None:
             return None
-        value, timestamp = self.cache[key]
-        if time.time() - timestamp > self.ttl:
+        value, timestamp = entry
+        if timestamp + self.ttl < _now():
             del self.cache[key]
             return None
         self.cache.move_to_end(key)
         return value
 
-    def set(self, key: str, value: Any) -> None:
+    def set(self, key: Hashable, value: Any) -> None:
+        now = _now()
+        self._purge_expired(now)
         if key in self.cache:
             self.cache.move_to_end(key)
-        self.cache[key] = (value, time.time())
+        self.cache[key] = (value, now)
+        heapq.heappush(self._expiry_heap, (now + self.ttl, next(self._seq), key))
         if len(self.cache) > self.capacity:
             self.cache.popitem(last=False)
+        # Re-sets and LRU evictions leave stale heap entries behind; rebuild from the
+        # live entries so the heap stays O(capacity) and drops evicted keys
+        if len(self._expiry_heap) > 2 * self.capacity:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        """Rebuilds the expiry heap from the entries currently in the cache."""
+        self._expiry_heap = [
+            (timestamp + self.ttl, next(self._seq), key)
+            for key, (_, timestamp) in self.cache.items()
+        ]
+        heapq.heapify(self._expiry_heap)
+
+    def _purge_expired(self, now: float) -> None:
+        """Drops entries whose TTL has passed, even if nothing reads them again."""
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now:
+            _, _, key = heapq.heappop(heap)
+            entry = self.cache.get(key)
+            # The key may have been re-set (newer timestamp) or already evicted
+            if entry is not None and entry[1] + self.ttl < now:
+                del self.cache[key]
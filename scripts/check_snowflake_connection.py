@@ -1,16 +1,66 @@
-
+"""
+Checks Snowflake connectivity and SELECT access to every registered view.
+Usage: python -m scripts.check_snowflake_connection (from the project root)
+"""
 import asyncio
-import sys
-import os
-from pathlib import Path
-
-# Add project root to path
-sys.path.append(str(Path(__file__).parent.parent))
+from typing import List, Tuple
 
 from app.snowflake_client import snowflake_client
 from app.config import settings
 from app.registry import load_view_registry
 
+# Number of views checked in parallel
+CHECK_CONCURRENCY = 8
+
+async def check_view(slug: str, table_name: str, semaphore: asyncio.Semaphore) -> Tuple[bool, List[str]]:
+    """Checks one view; returns (passed, output lines) so results can print atomically."""
+    async with semaphore:
+        lines = [f"   > Checking '{slug}' -> '{table_name}'..."]
+        try:
+            # 1. Check permission with LIMIT 1
+            query_perm = f"SELECT * FROM {table_name} LIMIT 1"
+            await asyncio.wait_for(snowflake_client.execute_query(query_perm), timeout=5.0)
+            
+            # 2. Check Count (if permission ok)
+            # Use a slightly longer timeout for count
+            query_count = f"SELECT COUNT(*) as CNT FROM {table_name}"
+            count_res = await asyncio.wait_for(snowflake_client.execute_query(query_count), timeout=10.0)
+            count = int(count_res[0]['cnt']) if count_res else 0
+            
+            lines[0] += f" ✅ OK (Rows: {count})"
+
+            # 3. Check Partition Fetching (reproduce 821 vs 1000 issue)
+            if count > 1000:
+                try:
+                    query_limit = f"SELECT * FROM {table_name} LIMIT 1000"
+                    # Set a strict timeout of 8 seconds for this check
+                    limit_res = await asyncio.wait_for(snowflake_client.execute_query(query_limit), timeout=8.0)
+                    rows = len(limit_res)
+                    if rows == 1000:
+                        lines.append(f"     > Verifying LIMIT 1000... ✅ Fetched {rows}")
+                    else:
+                        lines.append(f"     > Verifying LIMIT 1000... ⚠️ Fetched {rows} (Expected 1000)")
+                except asyncio.TimeoutError:
+                    lines.append(f"     > Verifying LIMIT 1000... ⚠️ SKIPPED (Timeout > 8s)")
+                except Exception as e:
+                    lines.append(f"     > Verifying LIMIT 1000... ⚠️ FAILED (Query Error: {str(e)})")
+            else:
+                lines.append(f"     > Skipping LIMIT 1000 (Table has {count} rows)")
+            
+            return True, lines
+        except asyncio.TimeoutError:
+            lines[0] += " ❌ TIMEOUT (5s)"
+            return False, lines
+        except Exception as e:
+            lines[0] += " ❌ FAILED"
+            # Clean error message
+            msg = str(e)
+            if "Snowflake Error" in msg:
+                lines.append(f"     Reason: {msg}")
+            else:
+                lines.append(f"     Error: {msg}")
+            return False, lines
+
 async def main():
     print(f"--- Snowflake Connectivity Check ---")
     print(f"Account: {settings.SNOWFLAKE_ACCOUNT}")
@@ -41,57 +91,20 @@ async def main():
         print(f"❌ Failed to load registry: {e}")
         registry = {}
 
-    # 3. Check Permissions for each View
+    # 3. Check Permissions for each View (bounded concurrency, printed as each finishes)
     print("\n[3] Checking Permissions for Views...")
     success_count = 0
     fail_count = 0
     
-    for slug, table_name in registry.items():
-        print(f"   > Checking '{slug}' -> '{table_name}'...", end=" ", flush=True)
-        try:
-            # 1. Check permission with LIMIT 1
-            query_perm = f"SELECT * FROM {table_name} LIMIT 1"
-            await asyncio.wait_for(snowflake_client.execute_query(query_perm), timeout=5.0)
-            
-            # 2. Check Count (if permission ok)
-            # Use a slightly longer timeout for count
-            query_count = f"SELECT COUNT(*) as CNT FROM {table_name}"
-            count_res = await asyncio.wait_for(snowflake_client.execute_query(query_count), timeout=10.0)
-            count = int(count_res[0]['cnt']) if count_res else 0
-            
-            print(f"✅ OK (Rows: {count})")
-
-            # 3. Check Partition Fetching (reproduce 821 vs 1000 issue)
-            if count > 1000:
-                print(f"     > Verifying LIMIT 1000...", end=" ", flush=True)
-                try:
-                    query_limit = f"SELECT * FROM {table_name} LIMIT 1000"
-                    # Set a strict timeout of 8 seconds for this check
-                    limit_res = await asyncio.wait_for(snowflake_client.execute_query(query_limit), timeout=8.0)
-                    rows = len(limit_res)
-                    if rows == 1000:
-                        print(f"✅ Fetched {rows}")
-                    else:
-                        print(f"⚠️ Fetched {rows} (Expected 1000)")
-                except asyncio.TimeoutError:
-                    print(f"⚠️ SKIPPED (Timeout > 8s)")
-                except Exception as e:
-                    print(f"⚠️ FAILED (Query Error: {str(e)})")
-            else:
-                print(f"     > Skipping LIMIT 1000 (Table has {count} rows)")
-            
+    semaphore = asyncio.Semaphore(CHECK_CONCURRENCY)
+    tasks = [check_view(slug, table_name, semaphore) for slug, table_name in registry.items()]
+    
+    for coro in asyncio.as_completed(tasks):
+        ok, lines = await coro
+        print("\n".join(lines), flush=True)
+        if ok:
             success_count += 1
-        except asyncio.TimeoutError:
-            print(f"❌ TIMEOUT (5s)")
-            fail_count += 1
-        except Exception as e:
-            print(f"❌ FAILED")
-            # Clean error message
-            msg = str(e)
-            if "Snowflake Error" in msg:
-                print(f"     Reason: {msg}")
-            else:
-                print(f"     Error: {msg}")
+        else:
             fail_count += 1
 
     print("\n------------------------------------")
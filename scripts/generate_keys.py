@@ -3,17 +3,12 @@
 Project: Snowflake Data Product API
 Developer: Rikesh Chhetri
 Description: Utility script to generate secure, random API keys.
+Usage: python -m scripts.generate_keys (from the project root)
 ------------------------------------------------------------------------------
 """
-import sys
-import os
-
-# Add project root to path so we can import from app
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from app.utils import generate_secure_key
 
-if __name__ == "__main__":
+def main():
     print("--- Secure API Key Generator ---")
     key = generate_secure_key()
     print(f"\nGenerated Key: {key}")
@@ -21,3 +16,6 @@ if __name__ == "__main__":
     print(f"API_KEY={key}")
     print("\nFor multiple keys (key rotation), separate them with a comma:")
     print("API_KEY=<primary-key>,<secondary-key>")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 
 import os
+import sys
+import asyncio
 import pytest
+import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 import respx
-from unittest.mock import patch
+from unittest.mock import patch, AsyncMock
+from cryptography.hazmat.primitives.asymmetric import rsa
 
 # Load test env before importing app
 # We need to make sure the app sees these values
@@ -17,10 +21,28 @@ os.environ["SNOWFLAKE_ROLE"] = "testrole"
 os.environ["SNOWFLAKE_DATABASE"] = "testdb"
 os.environ["SNOWFLAKE_SCHEMA"] = "testschema"
 os.environ["SNOWFLAKE_PRIVATE_KEY_PATH"] = "test_private_key.p8"
+# Low limit so rate-limit tests reach the boundary in a few requests
+os.environ["RATE_LIMIT_PRODUCTS"] = "3/minute"
 
 # Now we can safely import the app
 from app.main import app, response_cache
 from app.config import settings
+from app.dependencies import verify_api_key
+from fastapi import HTTPException, Request
+
+def pytest_asyncio_loop_factories(config, item):
+    """Run async tests on uvloop where it is available (it has no Windows build)."""
+    if sys.platform == "win32":
+        return {"asyncio": asyncio.new_event_loop}
+    import uvloop
+    return {"uvloop": uvloop.new_event_loop}
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_key_file(tmp_path_factory):
+    """Keeps the app's api_keys.json out of the working tree (and per xdist worker)."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("app.key_manager.KEY_FILE", str(tmp_path_factory.mktemp("keys") / "api_keys.json"))
+        yield
 
 @pytest.fixture(autouse=True)
 def clear_cache():
@@ -28,19 +50,81 @@ def clear_cache():
     response_cache.cache.clear()
     yield
 
+@pytest.fixture(autouse=True)
+def reset_limiter():
+    """Clears slowapi's in-memory counters after every test."""
+    yield
+    app.state.limiter.reset()
+
 @pytest.fixture(autouse=True)
 def mock_jwt():
     """Mocks JWT generation to avoid file access."""
     with patch("app.snowflake_client.get_snowflake_jwt", return_value="mock-jwt-token"):
         yield
 
-@pytest.fixture
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
 async def client():
+    """One ASGI client shared by the whole session."""
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
 
 @pytest.fixture
-def mock_snowflake():
+def limiter_disabled():
+    """Turns slowapi off for tests that only inspect the generated SQL."""
+    app.state.limiter.enabled = False
+    yield
+    app.state.limiter.enabled = True
+
+@pytest.fixture
+def api_key_override():
+    """Skips API key validation; yields the key tests should send."""
+    async def _accept():
+        return "test-api-key"
+    app.dependency_overrides[verify_api_key] = _accept
+    yield "test-api-key"
+    app.dependency_overrides.pop(verify_api_key, None)
+
+@pytest.fixture
+def header_api_key_override():
+    """Accepts whatever X-API-KEY is sent, so tests can act as distinct callers."""
+    async def _accept_header(request: Request):
+        key = request.headers.get("X-API-KEY")
+        if not key:
+            raise HTTPException(status_code=403, detail="Forbidden")
+        return key
+    app.dependency_overrides[verify_api_key] = _accept_header
+    yield
+    app.dependency_overrides.pop(verify_api_key, None)
+
+@pytest.fixture
+def mock_execute_query():
+    """Patches SnowflakeClient.execute_query; returns no rows unless overridden."""
+    with patch("app.main.snowflake_client.execute_query", new_callable=AsyncMock) as mock:
+        mock.return_value = []
+        yield mock
+
+@pytest.fixture(scope="module")
+def snowflake_router():
+    """One respx router per module; routes are cleared per test by mock_snowflake."""
+    with respx.mock(
+        base_url=f"https://{settings.SNOWFLAKE_ACCOUNT}.snowflakecomputing.com",
+        assert_all_called=False,
+    ) as router:
+        yield router
+
+@pytest.fixture
+def mock_snowflake(snowflake_router):
     """Mocks the Snowflake API."""
-    with respx.mock(base_url=f"https://{settings.SNOWFLAKE_ACCOUNT}.snowflakecomputing.com") as respx_mock:
-        yield respx_mock
+    snowflake_router.clear()
+    snowflake_router.reset()
+    yield snowflake_router
+
+@pytest.fixture(scope="session")
+def rsa_key():
+    """RSA key generated once per session; key generation is slow."""
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+@pytest.fixture(scope="session")
+def other_rsa_key():
+    """A second session key, for tests that need two distinct keys."""
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
@@ -1,5 +1,5 @@
 import pytest
-from app.registry import VIEW_ALLOWLIST
+from app.registry import VIEW_ALLOWLIST, VIEW_LOOKUP
 
 def test_manual_aliases_exist():
     """Test that hardcoded friendly aliases are preserved."""
@@ -24,3 +24,8 @@ def test_normalization():
     slug = "american-community-survey-attributes"
     assert slug in VIEW_ALLOWLIST
     assert VIEW_ALLOWLIST[slug] == "AMERICAN_COMMUNITY_SURVEY_ATTRIBUTES"
+
+def test_view_lookup_accepts_all_spellings():
+    """Test that slugs, table names and their case/dash variants resolve to the table."""
+    for view_id in ("companies", "COMPANIES", "COMPANY_INDEX", "company-index"):
+        assert VIEW_LOOKUP[view_id] == "COMPANY_INDEX"
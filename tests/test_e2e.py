@@ -115,3 +115,22 @@ async def test_snowflake_bad_request(client, mock_snowflake):
     data = response.json()
     assert data["status"] == "error"
     assert "Invalid parameter" in data["message"]
+
+@pytest.mark.asyncio
+async def test_snowflake_object_not_found(client, mock_snowflake):
+    # Snowflake reports a missing object with code 002003
+    error_json = {
+        "code": "002003",
+        "message": "Object 'COMPANY_INDEX' does not exist or not authorized."
+    }
+    mock_snowflake.post("/api/v2/statements").mock(
+        return_value=httpx.Response(422, json=error_json)
+    )
+    
+    response = await client.get("/v1/data/companies", headers={"X-API-KEY": settings.API_KEY})
+    
+    assert response.status_code == 404
+    data = response.json()
+    assert data["code"] == "002003"
+    assert data["message"] == "The requested data view could not be found in Snowflake."
+    assert "does not exist" in data["details"]["snowflake_message"]
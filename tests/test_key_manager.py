@@ -0,0 +1,63 @@
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+import orjson
+import pytest
+from app.key_manager import KeyManager
+
+@pytest.fixture
+def key_file(tmp_path, monkeypatch):
+    """Points KeyManager at a key file inside the test's tmp_path."""
+    path = tmp_path / "api_keys.json"
+    monkeypatch.setattr("app.key_manager.KEY_FILE", str(path))
+    return path
+
+def test_env_key_is_valid(key_file):
+    """Keys from the API_KEY env var are accepted."""
+    manager = KeyManager()
+    assert manager.is_valid("test-api-key")
+    assert not manager.is_valid("wrong-key")
+
+def test_add_and_revoke_key(key_file):
+    """Added keys are accepted immediately and rejected once revoked."""
+    manager = KeyManager()
+    new_key = "sk_test_add_and_revoke"
+    manager.add_key(new_key)
+    assert manager.is_valid(new_key)
+
+    manager.revoke_key(new_key)
+    assert not manager.is_valid(new_key)
+
+@pytest.mark.asyncio
+async def test_start_loads_keys(key_file):
+    """Keys are not read at construction, only by start() (or first use)."""
+    manager = KeyManager()
+    assert not manager._loaded
+
+    await manager.start()
+    assert manager._loaded
+    assert manager.is_valid("test-api-key")
+
+@pytest.mark.asyncio
+async def test_concurrent_add_key_persists_every_key(key_file, monkeypatch):
+    """Keys added from worker threads at the same time all reach the key file."""
+    manager = KeyManager()
+    manager._ensure_loaded()
+
+    # Stall the first save after its snapshot so the other add_key can
+    # finish in between, the interleaving that used to drop a key
+    calls = itertools.count()
+    def slow_dumps(*args, **kwargs):
+        if next(calls) == 0:
+            time.sleep(0.05)
+        return orjson.dumps(*args, **kwargs)
+    monkeypatch.setattr("app.key_manager.orjson", SimpleNamespace(
+        dumps=slow_dumps, loads=orjson.loads, OPT_INDENT_2=orjson.OPT_INDENT_2
+    ))
+
+    new_keys = ["sk_concurrent_a", "sk_concurrent_b"]
+    await asyncio.gather(*(asyncio.to_thread(manager.add_key, key) for key in new_keys))
+
+    reloaded = KeyManager()
+    assert all(reloaded.is_valid(key) for key in new_keys)
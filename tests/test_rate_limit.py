@@ -1,47 +1,32 @@
+import asyncio
 import pytest
-from httpx import AsyncClient
-from app.main import app
-from unittest.mock import patch, AsyncMock
+
+HEADERS_KEY1 = {"X-API-KEY": "key-user-1"}
+HEADERS_KEY2 = {"X-API-KEY": "key-user-2"}
+COMPANIES_URL = "/v1/data/companies"
 
 @pytest.mark.asyncio
-async def test_rate_limit_exceeded():
+@pytest.mark.xdist_group("rate_limit_serial")
+async def test_rate_limit_boundary_and_isolation(client, mock_execute_query, header_api_key_override):
     """
-    Test that the API correctly enforces the rate limit (50 requests per minute).
-    We will send 51 requests and verify the 51st fails with 429.
+    Test that the API enforces the rate limit (RATE_LIMIT_PRODUCTS, 3 per minute in tests) per API key.
+    Key 1 sends 4 requests and the 4th fails with 429; key 2 is still allowed.
     """
-    api_key = "test-rate-limit-key"
+    # Return a row so requests succeed quickly
+    mock_execute_query.return_value = [{"id": 1, "name": "Test Co"}]
     
-    # Mock verify_api_key to accept our test key
-    from app.dependencies import verify_api_key
-    async def mock_verify_api_key(x_api_key: str = None):
-        if x_api_key == api_key:
-            return api_key
-        return api_key
-
-    app.dependency_overrides[verify_api_key] = mock_verify_api_key
+    # Send 3 requests for key 1 - should succeed
+    responses = await asyncio.gather(*[client.get(COMPANIES_URL, headers=HEADERS_KEY1) for _ in range(3)])
+    assert all(r.status_code == 200 for r in responses)
     
-    # Mock snowflake_client.execute_query to return fast success
-    with patch("app.main.snowflake_client.execute_query", new_callable=AsyncMock) as mock_query:
-        mock_query.return_value = [{"id": 1, "name": "Test Co"}]
-        
-        from httpx import ASGITransport
-        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
-            headers = {"X-API-KEY": api_key}
-            
-            # Send 50 requests - should succeed
-            for i in range(50):
-                response = await client.get("/v1/data/companies", headers=headers)
-                assert response.status_code == 200, f"Request {i+1} failed with {response.status_code}"
-            
-            # Send 51st request - should fail
-            response = await client.get("/v1/data/companies", headers=headers)
-            assert response.status_code == 429
-            
-            data = response.json()
-            assert data["status"] == "error"
-            assert "Rate limit exceeded" in data["message"]
-            # slowapi detail format is "50 per 1 minute"
-            assert "50 per 1 minute" in data["message"]
-
-    # Clean up
-    app.dependency_overrides = {}
+    # Send 4th request for key 1 - should fail
+    response = await client.get(COMPANIES_URL, headers=HEADERS_KEY1)
+    assert response.status_code == 429
+    
+    # Check the body without decoding it; slowapi detail format is "3 per 1 minute"
+    assert b"Rate limit exceeded" in response.content
+    assert b"3 per 1 minute" in response.content
+    
+    # Key 2 has its own bucket
+    response = await client.get(COMPANIES_URL, headers=HEADERS_KEY2)
+    assert response.status_code == 200
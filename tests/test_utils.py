@@ -0,0 +1,49 @@
+from app.utils import TTLCache, generate_secure_key
+
+def test_cache_evicts_least_recently_used():
+    """The cache never holds more than `capacity` entries."""
+    cache = TTLCache(capacity=2, ttl_seconds=300)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # 'b' is now least recently used
+    cache.set("c", 3)
+
+    assert len(cache.cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_cache_expires_entries():
+    """Entries older than the TTL are not returned."""
+    cache = TTLCache(capacity=10, ttl_seconds=-1)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert "a" not in cache.cache
+
+def test_cache_purges_expired_entries_on_set():
+    """Expired entries are dropped on the next write even if never read again."""
+    cache = TTLCache(capacity=10, ttl_seconds=-1)
+    cache.set("a", 1)
+    cache.set(("b", 1), 2)
+
+    assert "a" not in cache.cache
+
+def test_cache_expiry_heap_stays_bounded():
+    """Evicted and re-set keys don't accumulate in the expiry heap."""
+    cache = TTLCache(capacity=2, ttl_seconds=300)
+    for i in range(1000):
+        cache.set(("view", i), i)
+        cache.set("same", i)
+
+    assert len(cache.cache) == 2
+    assert len(cache._expiry_heap) <= 2 * cache.capacity
+    assert {key for _, _, key in cache._expiry_heap} >= set(cache.cache)
+
+def test_generate_secure_key():
+    """Keys carry the prefix, the requested length and a URL-safe alphabet."""
+    key = generate_secure_key()
+    assert key.startswith("sk_")
+    assert len(key) == len("sk_") + 32
+    assert all(c.isalnum() or c in "-_" for c in key)
+    assert generate_secure_key() != key